@@ -1,14 +1,13 @@
 # encoding: utf-8
 
-"""The base Controller API
+"""The base rendering API
 
-Provides the BaseController class for subclassing.
+Provides the functions used by views to render templates and abort requests.
 """
 import logging
 
-from jinja2.exceptions import TemplateNotFound
-
 from flask import (
+    current_app,
     render_template as flask_render_template,
     abort as flask_abort
 )
@@ -60,26 +59,17 @@ def render_snippet(*template_names, **kw):
     :type kw: named arguments of any type that are supported by the template
     '''
 
-    last_exc = None
-    for template_name in template_names:
-        try:
-            output = render(template_name, extra_vars=kw)
-            if config.get_value('debug'):
-                output = (
-                    '\n<!-- Snippet %s start -->\n%s\n<!-- Snippet %s end -->'
-                    '\n' % (template_name, output, template_name))
-            return h.literal(output)
-        except TemplateNotFound as exc:
-            if exc.name == template_name:
-                # the specified template doesn't exist - try the next
-                # fallback, but store the exception in case it was
-                # last one
-                last_exc = exc
-                continue
-            # a nested template doesn't exist - don't fallback
-            raise exc
-    else:
-        raise last_exc or TemplateNotFound
+    # Pick the first template that exists before rendering it, so that a
+    # missing nested template raises TemplateNotFound instead of falling
+    # back to the next one, without having to catch and inspect the
+    # exception for each fallback.
+    template = current_app.jinja_env.select_template(template_names)
+    output = render(template, extra_vars=kw)
+    if config.get_value('debug'):
+        output = (
+            f'\n<!-- Snippet {template.name} start -->\n{output}\n'
+            f'<!-- Snippet {template.name} end -->\n')
+    return h.literal(output)
 
 
 def render(template_name, extra_vars=None):
@@ -107,6 +97,10 @@ def _allow_caching(cache_force=None):
     # Force cache or not if explicit.
     if cache_force is not None:
         allow_cache = cache_force
+    # Don't cache if caching is not enabled in config. This is the default,
+    # so check it first to skip inspecting the session and request.
+    elif not config.get_value('ckan.cache_enabled'):
+        allow_cache = False
     # Do not allow caching of pages for logged in users/flash messages etc.
     elif _is_valid_session_cookie_data():
         allow_cache = False
@@ -119,9 +113,6 @@ def _allow_caching(cache_force=None):
     # Don't cache if we have set the __no_cache__ param in the query string.
     elif request.params.get('__no_cache__'):
         allow_cache = False
-    # Don't cache if caching is not enabled in config
-    elif not config.get_value('ckan.cache_enabled'):
-        allow_cache = False
 
     if not allow_cache:
         # Prevent any further rendering from being cached.
@@ -129,10 +120,5 @@ def _allow_caching(cache_force=None):
 
 
 def _is_valid_session_cookie_data():
-    is_valid_cookie_data = False
-    for key, value in session.items():
-        if not key.startswith(u'_') and value:
-            is_valid_cookie_data = True
-            break
-
-    return is_valid_cookie_data
+    return any(value for key, value in session.items()
+               if not key.startswith(u'_'))
@@ -7,6 +7,7 @@ import logging
 from jinja2 import nodes
 from jinja2 import loaders
 from jinja2 import ext
+from jinja2.bccache import FileSystemBytecodeCache
 from jinja2.exceptions import TemplateNotFound
 from jinja2.utils import open_if_exists
 from markupsafe import escape
@@ -30,11 +31,25 @@ def _get_extensions():
             AssetExtension]
 
 
+def _get_bytecode_cache():
+    directory = config.get_value('ckan.template_bytecode_cache_dir')
+    if not directory:
+        return None
+    return FileSystemBytecodeCache(directory)
+
+
 def get_jinja_env_options():
     return dict(
         loader=CkanFileSystemLoader(config['computed_template_paths']),
         autoescape=True,
         extensions=_get_extensions(),
+        # The set of templates is bounded by what is on disk, so keep
+        # every compiled template around in a plain dict instead of
+        # Jinja's default 400 entries LRUCache, which locks and reorders
+        # its queue on every lookup and can evict hot templates on
+        # sites with many extensions.
+        cache_size=-1,
+        bytecode_cache=_get_bytecode_cache(),
     )
 
 
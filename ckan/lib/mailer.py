@@ -1,16 +1,23 @@
 # encoding: utf-8
 
-import codecs
-import os
+import atexit
+import hmac
+import secrets
 import smtplib
 import socket
 import logging
 import mimetypes
+import threading
+import weakref
+from collections import namedtuple
+from contextlib import contextmanager
 from time import time
 
 from email.message import EmailMessage
 from email import utils
 
+from flask import render_template
+
 from ckan.common import config
 import ckan.common
 
@@ -18,21 +25,49 @@ import ckan.common
 import ckan
 import ckan.model as model
 import ckan.lib.helpers as h
-from ckan.lib.base import render
 
 from ckan.common import _
 
 log = logging.getLogger(__name__)
 
+_X_MAILER = "CKAN %s" % ckan.__version__
+
 
 class MailerException(Exception):
     pass
 
 
-def _mail_recipient(recipient_name, recipient_email,
-                    sender_name, sender_url, subject,
-                    body, body_html=None, headers=None,
-                    attachments=None):
+# The first four fields are the ones used to open the SMTP connection
+_SMTPSettings = namedtuple(
+    u'SMTPSettings',
+    u'server starttls user password mail_from reply_to persistent_connection')
+
+# Connections kept open when smtp.persistent_connection is enabled, one per
+# thread as smtplib connections can't be shared between threads
+_persistent_smtp = threading.local()
+_persistent_smtp_connections = weakref.WeakSet()
+
+
+def _smtp_settings():
+    '''Read all the ``smtp.*`` config options needed to send an email.
+
+    They are read again on every call, as the config can be changed at
+    runtime, but only once per email instead of one lookup per use.
+    '''
+    return _SMTPSettings(
+        config.get_value('smtp.server'),
+        config.get_value('smtp.starttls'),
+        config.get_value('smtp.user'),
+        config.get_value('smtp.password'),
+        config.get_value('smtp.mail_from'),
+        config.get_value('smtp.reply_to'),
+        config.get_value('smtp.persistent_connection'),
+    )
+
+
+def _build_message(mail_from_header, reply_to,
+                   recipient_name, recipient_email, subject, body,
+                   body_html=None, headers=None, attachments=None):
 
     if not headers:
         headers = {}
@@ -40,9 +75,6 @@ def _mail_recipient(recipient_name, recipient_email,
     if not attachments:
         attachments = []
 
-    mail_from = config.get_value('smtp.mail_from')
-    reply_to = config.get_value('smtp.reply_to')
-
     msg = EmailMessage()
 
     msg.set_content(body, cte='base64')
@@ -57,10 +89,10 @@ def _mail_recipient(recipient_name, recipient_email,
             msg.add_header(k, v)
 
     msg['Subject'] = subject
-    msg['From'] = _("%s <%s>") % (sender_name, mail_from)
+    msg['From'] = mail_from_header
     msg['To'] = u"%s <%s>" % (recipient_name, recipient_email)
     msg['Date'] = utils.formatdate(time())
-    msg['X-Mailer'] = "CKAN %s" % ckan.__version__
+    msg['X-Mailer'] = _X_MAILER
     if reply_to and reply_to != '':
         msg['Reply-to'] = reply_to
 
@@ -81,11 +113,19 @@ def _mail_recipient(recipient_name, recipient_email,
         msg.add_attachment(
             _file.read(), filename=name, maintype=main_type, subtype=sub_type)
 
-    # Send the email using Python's smtplib.
-    smtp_server = config.get_value('smtp.server')
-    smtp_starttls = config.get_value('smtp.starttls')
-    smtp_user = config.get_value('smtp.user')
-    smtp_password = config.get_value('smtp.password')
+    return msg
+
+
+def _connect_smtp(smtp_settings):
+    '''Return a new connection to the SMTP server, ready to send emails.
+
+    The connection is put into TLS mode and logged in according to the
+    ``smtp.*`` config options.
+    '''
+    smtp_server = smtp_settings.server
+    smtp_starttls = smtp_settings.starttls
+    smtp_user = smtp_settings.user
+    smtp_password = smtp_settings.password
 
     try:
         smtp_connection = smtplib.SMTP(smtp_server)
@@ -113,16 +153,120 @@ def _mail_recipient(recipient_name, recipient_email,
             assert smtp_password, ("If smtp.user is configured then "
                                    "smtp.password must be configured as well.")
             smtp_connection.login(smtp_user, smtp_password)
+    except Exception:
+        smtp_connection.quit()
+        raise
+
+    return smtp_connection
+
+
+def _get_persistent_smtp(smtp_settings):
+    '''Return this thread's open SMTP connection, if it can be reused.'''
+    persistent = getattr(_persistent_smtp, 'connection', None)
+    if persistent is None:
+        return None
+
+    connection_settings, smtp_connection = persistent
+    if connection_settings == smtp_settings[:4]:
+        try:
+            # Make sure the server didn't close the connection meanwhile
+            if smtp_connection.noop()[0] == 250:
+                return smtp_connection
+        except (socket.error, smtplib.SMTPException):
+            pass
+
+    _close_persistent_smtp()
+    return None
+
+
+def _close_persistent_smtp():
+    '''Close this thread's persistent SMTP connection, if any.'''
+    persistent = getattr(_persistent_smtp, 'connection', None)
+    if persistent is None:
+        return
+    del _persistent_smtp.connection
+
+    _connection_settings, smtp_connection = persistent
+    _persistent_smtp_connections.discard(smtp_connection)
+    try:
+        smtp_connection.quit()
+    except (socket.error, smtplib.SMTPException):
+        smtp_connection.close()
+
+
+@atexit.register
+def _close_all_persistent_smtp():
+    for smtp_connection in list(_persistent_smtp_connections):
+        try:
+            smtp_connection.quit()
+        except (socket.error, smtplib.SMTPException):
+            smtp_connection.close()
+
 
-        smtp_connection.sendmail(mail_from, [recipient_email], msg.as_string())
-        log.info("Sent email to {0}".format(recipient_email))
+@contextmanager
+def _open_smtp(smtp_settings):
+    '''Yield a connection to the SMTP server, ready to send emails.
+
+    By default a new connection is opened and closed when the block exits.
+    If ``smtp.persistent_connection`` is enabled, the connection is kept
+    open and reused by the next emails sent from the same thread.
+    '''
+    persistent = smtp_settings.persistent_connection
+    smtp_connection = None
+    try:
+        if persistent:
+            smtp_connection = _get_persistent_smtp(smtp_settings)
+        if smtp_connection is None:
+            smtp_connection = _connect_smtp(smtp_settings)
+            if persistent:
+                _persistent_smtp.connection = (
+                    smtp_settings[:4], smtp_connection)
+                _persistent_smtp_connections.add(smtp_connection)
+
+        yield smtp_connection
 
     except smtplib.SMTPException as e:
+        if persistent:
+            # Don't reuse a connection in an unknown state
+            _close_persistent_smtp()
         msg = '%r' % e
         log.exception(msg)
         raise MailerException(msg)
     finally:
-        smtp_connection.quit()
+        if not persistent and smtp_connection is not None:
+            smtp_connection.quit()
+
+
+def _mail_recipients(sender_name, sender_url, recipients):
+    smtp_settings = _smtp_settings()
+    # Same sender for the whole batch, so only translate the header once
+    mail_from_header = _("%s <%s>") % (sender_name, smtp_settings.mail_from)
+
+    # Send all the emails over a single connection using Python's smtplib,
+    # so the connection, TLS handshake and login only happen once.
+    with _open_smtp(smtp_settings) as smtp_connection:
+        for recipient in recipients:
+            msg = _build_message(
+                mail_from_header, smtp_settings.reply_to, **recipient)
+            recipient_email = recipient['recipient_email']
+            smtp_connection.sendmail(
+                smtp_settings.mail_from, [recipient_email], msg.as_string())
+            log.info("Sent email to {0}".format(recipient_email))
+
+
+def _mail_recipient(recipient_name, recipient_email,
+                    sender_name, sender_url, subject,
+                    body, body_html=None, headers=None,
+                    attachments=None):
+    _mail_recipients(sender_name, sender_url, [{
+        'recipient_name': recipient_name,
+        'recipient_email': recipient_email,
+        'subject': subject,
+        'body': body,
+        'body_html': body_html,
+        'headers': headers,
+        'attachments': attachments,
+    }])
 
 
 def mail_recipient(
@@ -172,6 +316,36 @@ def mail_recipient(
         body_html=body_html, headers=headers, attachments=attachments)
 
 
+def mail_recipients(recipients):
+    '''Sends a batch of emails, reusing the same SMTP connection.
+
+    This is more efficient than calling
+    :py:func:`~ckan.lib.mailer.mail_recipient` in a loop, as the connection
+    to the SMTP server (including the TLS handshake and login) is only
+    established once for all the emails.
+
+    .. note:: You need to set up the :ref:`email-settings` to able to send
+        emails.
+
+    :param recipients: the emails to send, as dicts with the same keys as
+        the parameters of :py:func:`~ckan.lib.mailer.mail_recipient`::
+
+            [
+                {
+                    'recipient_name': 'Bob',
+                    'recipient_email': 'bob@example.com',
+                    'subject': 'Meeting',
+                    'body': 'The meeting is cancelled.',
+                },
+            ]
+
+    :type recipients: list of dicts
+    '''
+    site_title = config.get_value('ckan.site_title')
+    site_url = config.get_value('ckan.site_url')
+    return _mail_recipients(site_title, site_url, recipients)
+
+
 def mail_user(
         recipient, subject, body,
         body_html=None, headers=None, attachments=None):
@@ -193,6 +367,17 @@ def mail_user(
         body, body_html=body_html, headers=headers, attachments=attachments)
 
 
+def _render_email(template_name, extra_vars):
+    '''Render one of the ``emails/*.txt`` templates.
+
+    Compiled templates are kept in the cache of the Jinja environment, so
+    only the variables change from one email to the next. Unlike
+    :py:func:`ckan.lib.base.render` this doesn't run the page caching logic,
+    which is irrelevant for emails.
+    '''
+    return render_template(template_name, **extra_vars)
+
+
 def get_reset_link_body(user):
     extra_vars = {
         'reset_link': get_reset_link(user),
@@ -201,7 +386,7 @@ def get_reset_link_body(user):
         'user_name': user.name,
     }
     # NOTE: This template is translated
-    return render('emails/reset_password.txt', extra_vars)
+    return _render_email('emails/reset_password.txt', extra_vars)
 
 
 def get_invite_body(user, group_dict=None, role=None):
@@ -222,7 +407,7 @@ def get_invite_body(user, group_dict=None, role=None):
         extra_vars['group_title'] = group_dict.get('title')
 
     # NOTE: This template is translated
-    return render('emails/invite_user.txt', extra_vars)
+    return _render_email('emails/invite_user.txt', extra_vars)
 
 
 def get_reset_link(user):
@@ -238,7 +423,7 @@ def send_reset_link(user):
     extra_vars = {
         'site_title': config.get_value('ckan.site_title')
     }
-    subject = render('emails/reset_password_subject.txt', extra_vars)
+    subject = _render_email('emails/reset_password_subject.txt', extra_vars)
 
     # Make sure we only use the first line
     subject = subject.split('\n')[0]
@@ -252,7 +437,7 @@ def send_invite(user, group_dict=None, role=None):
     extra_vars = {
         'site_title': config.get_value('ckan.site_title')
     }
-    subject = render('emails/invite_user_subject.txt', extra_vars)
+    subject = _render_email('emails/invite_user_subject.txt', extra_vars)
 
     # Make sure we only use the first line
     subject = subject.split('\n')[0]
@@ -266,7 +451,7 @@ def create_reset_key(user):
 
 
 def make_key():
-    return codecs.encode(os.urandom(16), 'hex').decode()
+    return secrets.token_hex(16)
 
 
 def verify_reset_link(user, key):
@@ -274,4 +459,6 @@ def verify_reset_link(user, key):
         return False
     if not user.reset_key or len(user.reset_key) < 5:
         return False
-    return key.strip() == user.reset_key
+    # Compare as bytes, compare_digest() only accepts ASCII strings
+    return hmac.compare_digest(
+        key.strip().encode('utf-8'), user.reset_key.encode('utf-8'))
@@ -4,10 +4,12 @@ import logging
 import os
 import sys
 
-from flask import Blueprint
+from flask import Blueprint, has_app_context, has_request_context
+from sqlalchemy import event
 
 from ckan.common import c, g
 from ckan import logic
+from ckan import model
 from ckan import plugins
 import ckan.authz
 from . import signals
@@ -20,6 +22,8 @@ log = logging.getLogger(__name__)
 _package_plugins = {}
 # The fallback behaviour
 _default_package_plugin = None
+# The IPermissionLabels plugin in use
+_permission_labels_plugin = None
 
 # Mapping from group-type strings to IGroupForm instances
 _group_plugins = {}
@@ -30,24 +34,43 @@ _default_organization_plugin = None
 _group_controllers = {}
 # Mapping from group-type strings to blueprints
 _group_blueprints = {}
+# Mapping from plugin interfaces to the tuple of plugins implementing them
+_implementations = {}
 
 
 def reset_package_plugins():
+    _implementations.pop(plugins.IDatasetForm, None)
     global _default_package_plugin
     _default_package_plugin = None
-    global _package_plugins
-    _package_plugins = {}
+    global _permission_labels_plugin
+    _permission_labels_plugin = None
+    _package_plugins.clear()
 
 
 def reset_group_plugins():
+    _implementations.pop(plugins.IGroupForm, None)
     global _default_group_plugin
     _default_group_plugin = None
     global _default_organization_plugin
     _default_organization_plugin = None
-    global _group_plugins
-    _group_plugins = {}
-    global _group_controllers
-    _group_controllers = {}
+    _group_plugins.clear()
+    _group_controllers.clear()
+
+
+def _get_implementations(interface):
+    """
+    Returns the plugins implementing the given interface.
+
+    The list is only built the first time it is requested for each
+    interface, until it's cleared by the corresponding ``reset_*``
+    function, which runs every time plugins are loaded or unloaded.
+    """
+    try:
+        return _implementations[interface]
+    except KeyError:
+        implementations = tuple(plugins.PluginImplementations(interface))
+        _implementations[interface] = implementations
+        return implementations
 
 
 def lookup_package_plugin(package_type=None):
@@ -58,8 +81,7 @@ def lookup_package_plugin(package_type=None):
     fallback behaviour is used.
 
     """
-    if package_type is None:
-        return _default_package_plugin
+    # None is never registered as a type, so it gets the fallback too
     return _package_plugins.get(package_type, _default_package_plugin)
 
 
@@ -70,8 +92,7 @@ def lookup_group_plugin(group_type=None):
     If the group type is None or cannot be found in the mapping, then the
     fallback behaviour is used.
     """
-    if group_type is None:
-        return _default_group_plugin
+    # None is never registered as a type, so it gets the fallback too
     return _group_plugins.get(group_type, _default_organization_plugin
         if group_type == 'organization' else _default_group_plugin)
 
@@ -101,7 +122,7 @@ def register_package_plugins():
     global _default_package_plugin
 
     # Create the mappings and register the fallback behaviour if one is found.
-    for plugin in plugins.PluginImplementations(plugins.IDatasetForm):
+    for plugin in _get_implementations(plugins.IDatasetForm):
         if plugin.is_fallback():
             if _default_package_plugin is not None and not isinstance(_default_package_plugin, DefaultDatasetForm):
                 raise ValueError("More than one fallback "
@@ -130,7 +151,12 @@ def register_package_blueprints(app):
     from ckan.views.resource import resource, register_dataset_plugin_rules as dataset_resource_rules
 
     # Create the mappings and register the fallback behaviour if one is found.
-    for plugin in plugins.PluginImplementations(plugins.IDatasetForm):
+    for plugin in _get_implementations(plugins.IDatasetForm):
+        prepare_dataset_blueprint = getattr(
+            plugin, 'prepare_dataset_blueprint', None)
+        prepare_resource_blueprint = getattr(
+            plugin, 'prepare_resource_blueprint', None)
+
         for package_type in plugin.package_types():
 
             if package_type == u'dataset':
@@ -148,8 +174,8 @@ def register_package_blueprints(app):
                 dataset.import_name,
                 url_prefix='/{}'.format(package_type),
                 url_defaults={'package_type': package_type})
-            if hasattr(plugin, 'prepare_dataset_blueprint'):
-                dataset_blueprint = plugin.prepare_dataset_blueprint(
+            if prepare_dataset_blueprint is not None:
+                dataset_blueprint = prepare_dataset_blueprint(
                     package_type,
                     dataset_blueprint)
             register_dataset_plugin_rules(dataset_blueprint)
@@ -163,8 +189,8 @@ def register_package_blueprints(app):
                 resource.import_name,
                 url_prefix=u'/{}/<id>/resource'.format(package_type),
                 url_defaults={u'package_type': package_type})
-            if hasattr(plugin, 'prepare_resource_blueprint'):
-                resource_blueprint = plugin.prepare_resource_blueprint(
+            if prepare_resource_blueprint is not None:
+                resource_blueprint = prepare_resource_blueprint(
                     package_type,
                     resource_blueprint)
             dataset_resource_rules(resource_blueprint)
@@ -194,14 +220,13 @@ def register_group_plugins():
     global _default_group_plugin
     global _default_organization_plugin
 
-    for plugin in plugins.PluginImplementations(plugins.IGroupForm):
+    for plugin in _get_implementations(plugins.IGroupForm):
 
         # Get group_controller from plugin if there is one,
         # otherwise use 'group'
-        try:
-            group_controller = plugin.group_controller()
-        except AttributeError:
-            group_controller = 'group'
+        get_group_controller = getattr(plugin, 'group_controller', None)
+        group_controller = get_group_controller() \
+            if get_group_controller is not None else 'group'
 
         if hasattr(plugin, 'is_organization'):
             is_organization = plugin.is_organization
@@ -246,20 +271,23 @@ def register_group_blueprints(app):
 
     from ckan.views.group import group, register_group_plugin_rules
 
-    for plugin in plugins.PluginImplementations(plugins.IGroupForm):
+    for plugin in _get_implementations(plugins.IGroupForm):
 
         # Get group_controller from plugin if there is one,
         # otherwise use 'group'
-        try:
-            group_controller = plugin.group_controller()
-        except AttributeError:
-            group_controller = 'group'
+        get_group_controller = getattr(plugin, 'group_controller', None)
+        group_controller = get_group_controller() \
+            if get_group_controller is not None else 'group'
 
         if hasattr(plugin, 'is_organization'):
             is_organization = plugin.is_organization
         else:
             is_organization = group_controller == 'organization'
 
+        prepare_group_blueprint = getattr(
+            plugin, 'prepare_group_blueprint', None)
+        blueprint_kind = u"organization" if is_organization else u"group"
+
         for group_type in plugin.group_types():
 
             if group_type in (u'group', u'organization'):
@@ -277,20 +305,16 @@ def register_group_blueprints(app):
                                   url_defaults={
                                       u'group_type': group_type,
                                       u'is_organization': is_organization})
-            if hasattr(plugin, 'prepare_group_blueprint'):
-                blueprint = plugin.prepare_group_blueprint(
-                    group_type, blueprint)
+            if prepare_group_blueprint is not None:
+                blueprint = prepare_group_blueprint(group_type, blueprint)
             register_group_plugin_rules(blueprint)
-            signals.register_blueprint.send(
-                u"organization" if is_organization else u"group",
-                blueprint=blueprint)
+            signals.register_blueprint.send(blueprint_kind, blueprint=blueprint)
             app.register_blueprint(blueprint)
 
 
 def set_default_group_plugin():
     global _default_group_plugin
     global _default_organization_plugin
-    global _group_controllers
     # Setup the fallback behaviour if one hasn't been defined.
     if _default_group_plugin is None:
         _default_group_plugin = DefaultGroupForm()
@@ -317,9 +341,15 @@ def plugin_validate(plugin, context, data_dict, schema, action):
 
 def get_permission_labels():
     '''Return the permission label plugin (or default implementation)'''
-    for plugin in plugins.PluginImplementations(plugins.IPermissionLabels):
-        return plugin
-    return DefaultPermissionLabels()
+    global _permission_labels_plugin
+    if _permission_labels_plugin is None:
+        for plugin in plugins.PluginImplementations(
+                plugins.IPermissionLabels):
+            _permission_labels_plugin = plugin
+            break
+        else:
+            _permission_labels_plugin = DefaultPermissionLabels()
+    return _permission_labels_plugin
 
 
 class DefaultDatasetForm(object):
@@ -345,6 +375,8 @@ class DefaultDatasetForm(object):
        being registered.
 
     '''
+    __slots__ = ()
+
     def create_package_schema(self):
         return logic.schema.default_create_package_schema()
 
@@ -407,6 +439,8 @@ class DefaultGroupForm(object):
         don't want this being registered.
 
     """
+    __slots__ = ()
+
     def group_controller(self):
         return 'group'
 
@@ -556,6 +590,8 @@ class DefaultGroupForm(object):
 
 
 class DefaultOrganizationForm(DefaultGroupForm):
+    __slots__ = ()
+
     def group_controller(self):
         return 'organization'
 
@@ -593,6 +629,8 @@ class DefaultOrganizationForm(DefaultGroupForm):
 
 
 class DefaultTranslation(object):
+    __slots__ = ()
+
     def i18n_directory(self):
         '''Change the directory of the *.mo translation files
 
@@ -635,39 +673,65 @@ class DefaultPermissionLabels(object):
     - users can read datasets belonging to their orgs "member-(org id)"
     - users can read datasets where they are collaborators "collaborator-(dataset id)"
     '''
+    __slots__ = ()
+
     def get_dataset_labels(self, dataset_obj):
         if dataset_obj.state == u'active' and not dataset_obj.private:
             return [u'public']
 
         if ckan.authz.check_config_permission('allow_dataset_collaborators'):
             # Add a generic label for all this dataset collaborators
-            labels = [u'collaborator-%s' % dataset_obj.id]
+            labels = [f'collaborator-{dataset_obj.id}']
         else:
             labels = []
 
         if dataset_obj.owner_org:
-            labels.append(u'member-%s' % dataset_obj.owner_org)
+            labels.append(f'member-{dataset_obj.owner_org}')
         else:
-            labels.append(u'creator-%s' % dataset_obj.creator_user_id)
+            labels.append(f'creator-{dataset_obj.creator_user_id}')
 
         return labels
 
     def get_user_dataset_labels(self, user_obj):
-        labels = [u'public']
         if not user_obj:
-            return labels
-
-        labels.append(u'creator-%s' % user_obj.id)
-
-        orgs = logic.get_action(u'organization_list_for_user')(
-            {u'user': user_obj.id}, {u'permission': u'read'})
-        labels.extend(u'member-%s' % o[u'id'] for o in orgs)
+            return [u'public']
 
-        if ckan.authz.check_config_permission('allow_dataset_collaborators'):
+        sources = _get_user_dataset_label_sources(user_obj.id)
+        return [
+            u'public',
+            f'creator-{user_obj.id}',
+            *[f'member-{org_id}' for org_id in sources[u'organization_ids']],
             # Add a label for each dataset this user is a collaborator of
-            datasets = logic.get_action('package_collaborator_list_for_user')(
-                {'ignore_auth': True}, {'id': user_obj.id})
+            *[f'collaborator-{package_id}'
+              for package_id in sources[u'collaborator_package_ids']],
+        ]
 
-            labels.extend('collaborator-%s' % d['package_id'] for d in datasets)
 
-        return labels
+def _get_user_dataset_label_sources(user_id):
+    u'''
+    Return the result of the user_dataset_label_sources action for a user.
+
+    Within a request the result is kept on ``g``, as the labels of the
+    current user are needed by every package_show and package_search call
+    made while handling it. The memo is dropped whenever the session is
+    committed or rolled back, so membership changes are picked up.
+    '''
+    if not has_request_context():
+        return logic.get_action(u'user_dataset_label_sources')(
+            {u'ignore_auth': True}, {u'id': user_id})
+
+    memo = g.setdefault(u'_user_dataset_label_sources', {})
+    try:
+        return memo[user_id]
+    except KeyError:
+        sources = memo[user_id] = logic.get_action(
+            u'user_dataset_label_sources')(
+                {u'ignore_auth': True}, {u'id': user_id})
+        return sources
+
+
+@event.listens_for(model.Session, u'after_commit')
+@event.listens_for(model.Session, u'after_rollback')
+def _forget_user_dataset_label_sources(session):
+    if has_app_context():
+        g.pop(u'_user_dataset_label_sources', None)
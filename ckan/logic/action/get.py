@@ -606,6 +606,45 @@ def group_list_authz(context, data_dict):
     return group_list
 
 
+def _group_ids_to_capacities_for_user(model, user, permission):
+    '''Return a dict mapping the ids of the organizations where the
+    (non-sysadmin) user has the given permission to the capacity that grants
+    it, taking into account permissions cascading to sub-organizations.
+
+    The ids are not filtered by organization state.
+    '''
+    roles = authz.get_roles_with_permission(permission)
+
+    if not roles:
+        return {}
+    user_id = authz.get_user_id_for_username(user, allow_none=True)
+    if not user_id:
+        return {}
+
+    q = model.Session.query(model.Member, model.Group) \
+        .filter(model.Member.table_name == 'user') \
+        .filter(model.Member.capacity.in_(roles)) \
+        .filter(model.Member.table_id == user_id) \
+        .filter(model.Member.state == 'active') \
+        .join(model.Group)
+
+    roles_that_cascade = \
+        authz.check_config_permission('roles_that_cascade_to_sub_groups')
+    group_ids_to_capacities = {}
+    for member, group in q.all():
+        if member.capacity in roles_that_cascade:
+            children_group_ids = [
+                grp_tuple[0] for grp_tuple
+                in group.get_children_group_hierarchy(type='organization')
+            ]
+            for group_id in children_group_ids:
+                group_ids_to_capacities[group_id] = member.capacity
+
+        group_ids_to_capacities[group.id] = member.capacity
+
+    return group_ids_to_capacities
+
+
 def organization_list_for_user(context, data_dict):
     '''Return the organizations that the user has a given permission for.
 
@@ -669,40 +708,9 @@ def organization_list_for_user(context, data_dict):
         orgs_and_capacities = [(org, 'admin') for org in orgs_q.all()]
     else:
         # for non-Sysadmins check they have the required permission
-
-        permission = data_dict.get('permission', 'manage_group')
-
-        roles = authz.get_roles_with_permission(permission)
-
-        if not roles:
-            return []
-        user_id = authz.get_user_id_for_username(user, allow_none=True)
-        if not user_id:
-            return []
-
-        q = model.Session.query(model.Member, model.Group) \
-            .filter(model.Member.table_name == 'user') \
-            .filter(model.Member.capacity.in_(roles)) \
-            .filter(model.Member.table_id == user_id) \
-            .filter(model.Member.state == 'active') \
-            .join(model.Group)
-
-        group_ids = set()
-        roles_that_cascade = \
-            authz.check_config_permission('roles_that_cascade_to_sub_groups')
-        group_ids_to_capacities = {}
-        for member, group in q.all():
-            if member.capacity in roles_that_cascade:
-                children_group_ids = [
-                    grp_tuple[0] for grp_tuple
-                    in group.get_children_group_hierarchy(type='organization')
-                ]
-                for group_id in children_group_ids:
-                    group_ids_to_capacities[group_id] = member.capacity
-                group_ids |= set(children_group_ids)
-
-            group_ids_to_capacities[group.id] = member.capacity
-            group_ids.add(group.id)
+        group_ids_to_capacities = _group_ids_to_capacities_for_user(
+            model, user, data_dict.get('permission', 'manage_group'))
+        group_ids = set(group_ids_to_capacities)
 
         if not group_ids:
             return []
@@ -717,6 +725,59 @@ def organization_list_for_user(context, data_dict):
     return orgs_list
 
 
+def user_dataset_label_sources(context, data_dict):
+    '''Return the ids the dataset permission labels of a user are built from.
+
+    This is a lighter alternative to calling both
+    ``organization_list_for_user`` (with the ``read`` permission) and
+    ``package_collaborator_list_for_user``, as it only queries the ids
+    and does not dictize the organizations or collaborators.
+
+    :param id: the id or name of the user
+    :type id: string
+
+    :returns: a dict with the ids of the active organizations the user can
+        read (``organization_ids``) and the ids of the datasets the user is a
+        collaborator in (``collaborator_package_ids``, always empty unless
+        :ref:`ckan.auth.allow_dataset_collaborators` is enabled)
+    :rtype: dictionary
+
+    '''
+    model = context['model']
+
+    user_id = _get_or_bust(data_dict, 'id')
+
+    _check_access('user_dataset_label_sources', context, data_dict)
+
+    user = model.User.get(user_id)
+    if not user:
+        raise NotFound(_('User not found'))
+
+    orgs_q = model.Session.query(model.Group.id) \
+        .filter(model.Group.is_organization == True) \
+        .filter(model.Group.state == 'active')
+
+    if authz.is_sysadmin(user.name):
+        organization_ids = [org_id for (org_id,) in orgs_q]
+    else:
+        group_ids = _group_ids_to_capacities_for_user(model, user.name, 'read')
+        organization_ids = []
+        if group_ids:
+            orgs_q = orgs_q.filter(model.Group.id.in_(list(group_ids)))
+            organization_ids = [org_id for (org_id,) in orgs_q]
+
+    collaborator_package_ids = []
+    if authz.check_config_permission('allow_dataset_collaborators'):
+        q = model.Session.query(model.PackageMember.package_id) \
+            .filter(model.PackageMember.user_id == user.id)
+        collaborator_package_ids = [package_id for (package_id,) in q]
+
+    return {
+        'organization_ids': organization_ids,
+        'collaborator_package_ids': collaborator_package_ids,
+    }
+
+
 def license_list(context, data_dict):
     '''Return the list of licenses available for datasets on the site.
 
@@ -63,6 +63,17 @@ def organization_list_for_user(context, data_dict):
     return {'success': True}
 
 
+def user_dataset_label_sources(context, data_dict):
+    '''Checks if a user is allowed to get the dataset label sources of a user
+
+    The current implementation restricts to the own users themselves.
+    '''
+    user_obj = context.get('auth_user_obj')
+    if user_obj and data_dict.get('id') in (user_obj.name, user_obj.id):
+        return {'success': True}
+    return {'success': False}
+
+
 def license_list(context, data_dict):
     # Licenses list is visible by default
     return {'success': True}
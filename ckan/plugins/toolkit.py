@@ -69,7 +69,7 @@ from ckan.lib.plugins import (
 )
 from ckan.cli import error_shout
 
-from ckan.lib.mailer import mail_recipient, mail_user
+from ckan.lib.mailer import mail_recipient, mail_recipients, mail_user
 
 
 __all__ = [
@@ -89,7 +89,7 @@ __all__ = [
     "asbool", "asint", "aslist",
     "DefaultDatasetForm", "DefaultGroupForm", "DefaultOrganizationForm",
     "error_shout",
-    "mail_recipient", "mail_user",
+    "mail_recipient", "mail_recipients", "mail_user",
     "render_snippet", "add_template_directory", "add_public_directory",
     "add_resource", "add_ckan_admin_tab",
     "check_ckan_version", "requires_ckan_version", "get_endpoint",
@@ -139,13 +139,14 @@ def add_public_directory(config_, relative_path):
 
 def _add_served_directory(config_, relative_path, config_var):
     """Add extra public/template directories to config."""
-    import inspect
     import os
+    import sys
 
     assert config_var in ("extra_template_paths", "extra_public_paths")
     # we want the filename that of the function caller but they will
-    # have used one of the available helper functions
-    filename = inspect.stack()[2].filename
+    # have used one of the available helper functions. Only the frame is
+    # needed, inspect.stack() would also read the source of every frame
+    filename = sys._getframe(2).f_code.co_filename
 
     this_dir = os.path.dirname(filename)
     absolute_path = os.path.join(this_dir, relative_path)
@@ -167,13 +168,13 @@ def add_resource(path, name):
     See :doc:`/theming/index` for more details.
 
     """
-    import inspect
     import os
+    import sys
     from ckan.lib.webassets_tools import create_library
 
     # we want the filename that of the function caller but they
     # will have used one of the available helper functions
-    filename = inspect.stack()[1].filename
+    filename = sys._getframe(1).f_code.co_filename
 
     this_dir = os.path.dirname(filename)
     absolute_path = os.path.join(this_dir, path)
@@ -2,7 +2,9 @@
 
 import six
 import pytest
+from jinja2.exceptions import TemplateNotFound
 
+import ckan.lib.base as base
 import ckan.tests.factories as factories
 
 
@@ -18,6 +20,21 @@ def test_comment_absent_if_debug_false(app):
     assert "<!-- Snippet " not in response
 
 
+@pytest.mark.usefixtures("with_request_context")
+def test_render_snippet_template_not_found():
+    with pytest.raises(TemplateNotFound):
+        base.render_snippet(
+            "snippets/not_a_snippet.html", "snippets/not_a_snippet_either.html")
+
+
+def test_template_bytecode_cache(make_app, ckan_config, monkeypatch, tmpdir):
+    monkeypatch.setitem(
+        ckan_config, "ckan.template_bytecode_cache_dir", str(tmpdir))
+    app = make_app()
+    app.get("/")
+    assert tmpdir.listdir()
+
+
 def test_apitoken_missing(app):
     request_headers = {}
 
@@ -4,6 +4,7 @@ import base64
 import pytest
 import six
 import io
+import unittest.mock as mock
 from email.header import decode_header
 from email.mime.text import MIMEText
 from email.parser import Parser
@@ -100,6 +101,36 @@ class TestMailer(MailerBase):
         )
         assert expected_html_body in msg[3]
 
+    def test_mail_recipients(self, mail_server):
+        users = [factories.User(), factories.User()]
+
+        msgs = mail_server.get_smtp_messages()
+        assert msgs == []
+
+        # send emails
+        test_emails = [
+            {
+                "recipient_name": user["name"],
+                "recipient_email": user["email"],
+                "subject": "Meeting",
+                "body": "The meeting is cancelled.\n",
+            }
+            for user in users
+        ]
+        mailer.mail_recipients(test_emails)
+
+        # check they went to the mock smtp server
+        msgs = mail_server.get_smtp_messages()
+        assert len(msgs) == 2
+        for msg, test_email in zip(msgs, test_emails):
+            assert msg[1] == config["smtp.mail_from"]
+            assert msg[2] == [test_email["recipient_email"]]
+            assert test_email["subject"] in msg[3], msg[3]
+            expected_body = self.mime_encode(
+                test_email["body"], test_email["recipient_name"]
+            )
+            assert expected_body in msg[3]
+
     def test_mail_user(self, mail_server):
 
         user = factories.User()
@@ -244,6 +275,32 @@ class TestMailer(MailerBase):
         assert org["title"] in six.ensure_text(body)
         assert h.roles_translated()[role] in six.ensure_text(body)
 
+    @pytest.mark.ckan_config("smtp.persistent_connection", True)
+    def test_persistent_connection(self, mail_server, monkeypatch):
+        monkeypatch.setattr(mail_server, "ehlo", mock.Mock())
+        monkeypatch.setattr(mail_server, "quit", mock.Mock())
+        monkeypatch.setattr(
+            mail_server, "noop", mock.Mock(return_value=(250, b"OK")),
+            raising=False)
+        try:
+            for _i in range(2):
+                mailer.mail_recipient(
+                    "Bob", "bob@example.com", "Meeting", "Cancelled.")
+        finally:
+            mailer._close_persistent_smtp()
+
+        assert len(mail_server.get_smtp_messages()) == 2
+        # connected once, and only closed when explicitly asked to
+        assert mail_server.ehlo.call_count == 1
+        assert mail_server.quit.call_count == 1
+
+    def test_verify_reset_link(self):
+        user = model.User(name="mary", reset_key=mailer.make_key())
+        assert mailer.verify_reset_link(user, user.reset_key)
+        assert mailer.verify_reset_link(user, " {} ".format(user.reset_key))
+        assert not mailer.verify_reset_link(user, "wrong-key")
+        assert not mailer.verify_reset_link(user, u"\u2665")
+
     @pytest.mark.ckan_config("smtp.server", "999.999.999.999")
     def test_bad_smtp_host(self):
         test_email = {
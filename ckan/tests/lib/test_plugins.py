@@ -0,0 +1,57 @@
+# encoding: utf-8
+
+import pytest
+
+import ckan.lib.plugins as lib_plugins
+import ckan.model as model
+import ckan.tests.factories as factories
+from ckan.common import g
+
+
+@pytest.mark.usefixtures("clean_db", "with_request_context")
+class TestDefaultPermissionLabels(object):
+    def test_user_dataset_labels(self):
+        user = factories.User()
+        org = factories.Organization(
+            users=[{"name": user["name"], "capacity": "member"}]
+        )
+        user_obj = model.User.get(user["id"])
+
+        labels = lib_plugins.DefaultPermissionLabels(
+        ).get_user_dataset_labels(user_obj)
+
+        assert labels == [
+            "public",
+            "creator-%s" % user["id"],
+            "member-%s" % org["id"],
+        ]
+
+    def test_anonymous_user_dataset_labels(self):
+        labels = lib_plugins.DefaultPermissionLabels(
+        ).get_user_dataset_labels(None)
+
+        assert labels == ["public"]
+
+    def test_user_dataset_label_sources_are_memoized(self):
+        user = factories.User()
+        user_obj = model.User.get(user["id"])
+        plugin = lib_plugins.DefaultPermissionLabels()
+
+        plugin.get_user_dataset_labels(user_obj)
+
+        assert user["id"] in g._user_dataset_label_sources
+
+    def test_memo_is_dropped_on_commit(self):
+        user = factories.User()
+        user_obj = model.User.get(user["id"])
+        plugin = lib_plugins.DefaultPermissionLabels()
+
+        assert plugin.get_user_dataset_labels(user_obj) == [
+            "public", "creator-%s" % user["id"]]
+
+        org = factories.Organization(
+            users=[{"name": user["name"], "capacity": "member"}]
+        )
+
+        assert "member-%s" % org["id"] in plugin.get_user_dataset_labels(
+            user_obj)
@@ -2483,6 +2483,79 @@ class TestOrganizationListForUser(object):
         assert org_list_for_user3 == []
 
 
+@pytest.mark.usefixtures("clean_db")
+class TestUserDatasetLabelSources(object):
+    def test_returns_readable_organization_ids(self):
+        user = factories.User()
+        org1 = factories.Organization(
+            users=[{"name": user["name"], "capacity": "member"}]
+        )
+        org2 = factories.Organization(
+            users=[{"name": user["name"], "capacity": "admin"}]
+        )
+        factories.Organization()
+
+        sources = helpers.call_action(
+            "user_dataset_label_sources", id=user["id"]
+        )
+
+        assert sorted(sources["organization_ids"]) == sorted(
+            [org1["id"], org2["id"]]
+        )
+        assert sources["collaborator_package_ids"] == []
+
+    def test_matches_organization_list_for_user(self):
+        user = factories.User()
+        factories.Organization(
+            users=[{"name": user["name"], "capacity": "editor"}]
+        )
+        factories.Organization()
+
+        sources = helpers.call_action(
+            "user_dataset_label_sources", id=user["id"]
+        )
+        orgs = helpers.call_action(
+            "organization_list_for_user", id=user["id"], permission="read"
+        )
+
+        assert sources["organization_ids"] == [org["id"] for org in orgs]
+
+    def test_sysadmin_gets_all_organizations(self):
+        sysadmin = factories.Sysadmin()
+        org1 = factories.Organization()
+        org2 = factories.Organization()
+
+        sources = helpers.call_action(
+            "user_dataset_label_sources", id=sysadmin["id"]
+        )
+
+        assert sorted(sources["organization_ids"]) == sorted(
+            [org1["id"], org2["id"]]
+        )
+
+    @pytest.mark.ckan_config("ckan.auth.allow_dataset_collaborators", True)
+    def test_returns_collaborator_package_ids(self):
+        user = factories.User()
+        dataset = factories.Dataset()
+        factories.Dataset()
+        helpers.call_action(
+            "package_collaborator_create",
+            id=dataset["id"],
+            user_id=user["id"],
+            capacity="member",
+        )
+
+        sources = helpers.call_action(
+            "user_dataset_label_sources", id=user["id"]
+        )
+
+        assert sources["collaborator_package_ids"] == [dataset["id"]]
+
+    def test_user_not_found(self):
+        with pytest.raises(logic.NotFound):
+            helpers.call_action("user_dataset_label_sources", id="not-there")
+
+
 @pytest.mark.ckan_config("ckan.plugins", "image_view")
 @pytest.mark.usefixtures("clean_db", "with_plugins")
 class TestShowResourceView(object):
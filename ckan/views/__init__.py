@@ -2,6 +2,8 @@
 
 from sqlalchemy import inspect
 import six
+from werkzeug.datastructures import ResponseCacheControl
+from werkzeug.http import parse_cache_control_header
 
 from urllib.parse import quote
 
@@ -81,16 +83,24 @@ def set_cache_control_headers_for_response(response):
     if u'Pragma' in response.headers:
         del response.headers["Pragma"]
 
+    # Every change made through `response.cache_control` parses and writes
+    # back the whole header, so update a detached copy of the existing
+    # directives and only set the header once.
+    cache_control = parse_cache_control_header(
+        response.headers.get(u'Cache-Control'), cls=ResponseCacheControl)
+
     if allow_cache:
-        response.cache_control.public = True
+        cache_control.public = True
         try:
             cache_expire = config.get_value(u'ckan.cache_expires')
-            response.cache_control.max_age = cache_expire
-            response.cache_control.must_revalidate = True
+            cache_control.max_age = cache_expire
+            cache_control.must_revalidate = True
         except ValueError:
             pass
     else:
-        response.cache_control.private = True
+        cache_control.private = True
+
+    response.headers[u'Cache-Control'] = cache_control.to_header()
 
     return response
 
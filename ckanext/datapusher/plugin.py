@@ -47,7 +47,8 @@ class DatapusherPlugin(p.SingletonPlugin):
     def configure(self, config):
         self.config = config
 
-        self.datapusher_formats = config.get_value(u'ckan.datapusher.formats')
+        self.datapusher_formats = frozenset(
+            f.lower() for f in config.get_value(u'ckan.datapusher.formats'))
 
         for config_option in (
             u'ckan.site_url',
@@ -84,6 +85,9 @@ class DatapusherPlugin(p.SingletonPlugin):
     # IResourceUrlChange
 
     def notify(self, resource):
+        if not self._should_submit(resource.format, resource.url_type):
+            return
+
         context = {
             u'model': model,
             u'ignore_auth': True,
@@ -101,24 +105,24 @@ class DatapusherPlugin(p.SingletonPlugin):
 
         self._submit_to_datapusher(resource_dict)
 
+    def _should_submit(self, resource_format, url_type):
+        return bool(
+            resource_format
+            and resource_format.lower() in self.datapusher_formats
+            and url_type != u'datapusher'
+        )
+
     def _submit_to_datapusher(self, resource_dict):
+        if not self._should_submit(
+                resource_dict.get('format'), resource_dict.get('url_type')):
+            return
+
         context = {
             u'model': model,
             u'ignore_auth': True,
             u'defer_commit': True
         }
 
-        resource_format = resource_dict.get('format')
-
-        submit = (
-            resource_format
-            and resource_format.lower() in self.datapusher_formats
-            and resource_dict.get('url_type') != u'datapusher'
-        )
-
-        if not submit:
-            return
-
         try:
             task = toolkit.get_action(u'task_status_show')(
                 context, {